@@ -1,7 +1,13 @@
+import os
+from pathlib import Path
+
 from fastmcp import Context, FastMCP
 
 mcp = FastMCP("my-mc")
 
+# 单次读取的文件大小上限，避免误读大文件占满内存
+MAX_READ_BYTES = 10 * 1024 * 1024
+
 @mcp.tool()
 def read_text_file(file_path: str) -> str:
     """
@@ -11,9 +17,11 @@ def read_text_file(file_path: str) -> str:
     :return: 文件内容字符串
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return content
+        size = os.stat(file_path).st_size
+        if size > MAX_READ_BYTES:
+            print(f"⚠️ 文件过大 ({size} 字节，上限 {MAX_READ_BYTES}): {file_path}")
+            return ""
+        return Path(file_path).read_text(encoding="utf-8", errors="replace")
     except FileNotFoundError:
         print(f"❌ 文件未找到: {file_path}")
         return ""
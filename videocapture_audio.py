@@ -0,0 +1,187 @@
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pyttsx3
+import sounddevice as sd
+from fastmcp import FastMCP
+from scipy.io.wavfile import write
+
+
+_asr_model = None
+# Concurrent first calls would each load (and download) the model
+_asr_model_lock = threading.Lock()
+
+def _get_asr_model():
+    """Load the FunASR model on first use, so server startup doesn't pay for it"""
+    global _asr_model
+    if _asr_model is None:
+        with _asr_model_lock:
+            if _asr_model is None:
+                from funasr import AutoModel
+
+                # 1️⃣ 加载模型（第一次会自动下载）
+                _asr_model = AutoModel(model="paraformer-zh",  # 中文模型
+                                       vad_model="fsmn-vad",   # 语音活动检测
+                                       punc_model="ct-punc")   # 自动加标点
+    return _asr_model
+
+
+def register_audio_tools(mcp: FastMCP) -> None:
+    """Register the speech output and recording tools on the server"""
+    mcp.tool()(agent_result)
+    mcp.tool()(record_speech_text)
+
+async def agent_result(text: str) -> bool:
+    """
+        Play the result for the user to listen to
+
+        Args:
+            text (str): The play of content
+        Returns:
+            bool: is played
+    """
+    return await asyncio.to_thread(_agent_result, text)
+
+def _agent_result(text: str) -> bool:
+    print(f"agent result：{text}")
+    _speak(text)
+    return True
+
+_tts_engine = None
+# SAPI5 and NSSpeechSynthesizer engines only work on the thread that created
+# them, so the engine lives on, and every utterance runs on, this one thread
+_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+
+def _speak_on_tts_thread(text: str) -> None:
+    global _tts_engine
+    if _tts_engine is None:
+        _tts_engine = pyttsx3.init()
+    _tts_engine.say(text)
+    _tts_engine.runAndWait()
+
+def _speak(text: str) -> None:
+    """Speak text with a shared TTS engine, initialised on first use"""
+    _tts_executor.submit(_speak_on_tts_thread, text).result()
+
+async def record_speech_text(duration=5, samplerate=16000) -> str:
+    """
+    Record for a duration using a microphone and convert it into text
+
+    Args:
+        duration (int): Recording duration, in seconds
+        samplerate (int): sampling rate
+
+    Returns:
+        str: the text from record
+    """
+    return await asyncio.to_thread(_record_speech_text, duration, samplerate)
+
+def _record_speech_text(duration=5, samplerate=16000) -> str:
+    audio = _record_audio(duration, samplerate)
+    if audio.size == 0:
+        raise RuntimeError("No audio recorded")
+    # 2️⃣ 直接识别内存中的音频（float32，[-1, 1]），不经过 WAV 文件
+    model = _get_asr_model()
+    res = model.generate(input=audio[:, 0], fs=samplerate)
+
+    # 3️⃣ 输出文字结果
+    text = res[0]['text']
+    print(text)
+    return text
+
+class AudioRecorder:
+    """
+    Keep a microphone input stream open and record fixed-length clips from it.
+
+    Reopening the PortAudio device for every recording is slow, so the stream
+    stays open after first use and its callback fills a reusable buffer only
+    while a recording is in progress.
+    """
+
+    def __init__(self):
+        self._stream: Optional[sd.InputStream] = None
+        self._samplerate: Optional[int] = None
+        self._buf = np.empty((0, 1), dtype=np.float32)
+        self._pos = 0
+        self._target = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._status = sd.CallbackFlags()
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        if status and self._target:
+            self._status |= status
+        n = min(frames, self._target - self._pos)
+        if n <= 0:
+            return
+        self._buf[self._pos:self._pos + n] = indata[:n]
+        self._pos += n
+        if self._pos >= self._target:
+            self._done.set()
+
+    def record(self, duration: float, samplerate: int) -> np.ndarray:
+        """Record duration seconds of mono float32 audio"""
+        with self._lock:
+            # Reopen if PortAudio stopped the stream (device change or error)
+            if self._stream is None or self._samplerate != samplerate or not self._stream.active:
+                if self._stream is not None:
+                    self._stream.close()
+                self._stream = sd.InputStream(samplerate=samplerate, channels=1, dtype="float32",
+                                              blocksize=1024, callback=self._callback)
+                self._stream.start()
+                self._samplerate = samplerate
+
+            n = int(duration * samplerate)
+            if len(self._buf) < n:
+                self._buf = np.empty((n, 1), dtype=np.float32)
+            self._done.clear()
+            self._status = sd.CallbackFlags()
+            self._pos = 0
+            # Setting the target last arms the callback
+            self._target = n
+            self._done.wait(timeout=duration + 2)
+            self._target = 0
+
+            if self._status:
+                print(f"⚠️ 录音状态异常：{self._status}")
+            if self._pos < n:
+                # Force a reopen next time in case the stream is wedged
+                self._stream.close()
+                self._stream = None
+                raise RuntimeError(f"Recording stopped early: got {self._pos} of {n} samples ({self._status})")
+            return self._buf[:n].copy()
+
+_recorder = AudioRecorder()
+
+def _record_audio(duration=5, samplerate=16000) -> np.ndarray:
+    # 1️⃣ TTS 提示
+    _speak("请说话")
+
+    # 2️⃣ 录音
+    print(f"开始录音，时长 {duration} 秒...")
+    return _recorder.record(duration, samplerate)
+
+def record_speech_file(duration=5, samplerate=16000) -> str:
+    """
+    Record from the microphone and save it as a WAV file.
+
+    Args:
+        duration (int): Recording duration, in seconds
+        samplerate (int): sampling rate
+
+    Returns:
+        str: path of the WAV file
+    """
+    audio = _record_audio(duration, samplerate)
+
+    # 3️⃣ 保存到临时文件
+    temp_dir = tempfile.gettempdir()
+    temp_file = os.path.join(temp_dir, "speech_input.wav")
+    write(temp_file, samplerate, audio)  # 保存 WAV
+    print(f"录音已保存到：{temp_file}")
+    return temp_file
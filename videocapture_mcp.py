@@ -1,32 +1,186 @@
 import tempfile
 from pathlib import Path
+import os
+import sys
+
+# OpenCV reads these when it is imported. Give each FFmpeg capture a single
+# decode thread instead of one per core, which oversubscribes the CPU (and can
+# trip FFmpeg's async_lock assertion) with several cameras open.
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "threads;1")
+if sys.platform == "win32":
+    # Cameras are opened with DirectShow, don't let MSMF initialise first
+    os.environ.setdefault("OPENCV_VIDEOIO_PRIORITY_MSMF", "0")
 
 import cv2
+import numpy as np
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 from fastmcp import Context, FastMCP
 from fastmcp.utilities.types import Image
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 
-import pyttsx3
-import sounddevice as sd
-from scipy.io.wavfile import write
-import tempfile
-import os
-
-from funasr import AutoModel
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
-# 1️⃣ 加载模型（第一次会自动下载）
-model = AutoModel(model="paraformer-zh",  # 中文模型
-                  vad_model="fsmn-vad",   # 语音活动检测
-                  punc_model="ct-punc")   # 自动加标点
+# Cap OpenCV's internal pool (used by imencode/resize); frames are already
+# processed concurrently on tool worker threads
+cv2.setNumThreads(min(4, os.cpu_count() or 1))
 
 
 # Store active video capture objects
 active_captures: Dict[str, cv2.VideoCapture] = {}
+# Background frame grabbers, one per active connection
+_grabbers: Dict[str, "FrameGrabber"] = {}
+# device_index -> connection IDs opened on that device, for O(1) lookup in quick_capture
+_by_device: Dict[int, List[str]] = {}
+# Reference counts of temporary connections opened by _acquire_device; the last
+# user closes them. Connections from open_camera are not in here.
+_temp_refs: Dict[str, int] = {}
+# Guards active_captures, _grabbers, _by_device, _temp_refs and _device_locks
+_captures_lock = threading.RLock()
+# Per-device locks, so finding or opening a device is atomic
+_device_locks: Dict[int, threading.RLock] = {}
+
+def _device_lock(device_index: int) -> threading.RLock:
+    with _captures_lock:
+        lock = _device_locks.get(device_index)
+        if lock is None:
+            lock = _device_locks[device_index] = threading.RLock()
+        return lock
+
+def _connection_device(connection_id: str) -> Optional[int]:
+    with _captures_lock:
+        for device_index, device_keys in _by_device.items():
+            if connection_id in device_keys:
+                return device_index
+        return None
+
+def _lock_connection_device(connection_id: str) -> Optional[threading.RLock]:
+    """
+    Acquire the device lock of a connection, so it can be closed without a
+    concurrent _acquire_device reopening the camera before it is released.
+
+    Returns:
+        The held lock (the caller releases it), or None if the connection is closed
+    """
+    while True:
+        device_index = _connection_device(connection_id)
+        if device_index is None:
+            return None
+        lock = _device_lock(device_index)
+        lock.acquire()
+        # The connection may have been closed (and its name reused) meanwhile
+        if _connection_device(connection_id) == device_index:
+            return lock
+        lock.release()
+
+class FrameGrabber:
+    """
+    Continuously read frames from a camera on a daemon thread.
+
+    Only the most recent frame is kept (older frames are dropped), so tool
+    calls get the newest image without blocking on the camera driver.
+
+    The grabber owns the VideoCapture: every read, get, set and the final
+    release go through its lock, and the camera is released by the reader
+    thread itself once it has stopped, so it is never released mid-read.
+    """
+
+    def __init__(self, connection_id: str, cap: cv2.VideoCapture):
+        self._cap = cap
+        self._cap_lock = threading.Lock()
+        self._released = False
+        self._latest: Optional[np.ndarray] = None
+        self._latest_time = 0.0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{connection_id}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                with self._cap_lock:
+                    ret, frame = self._cap.read()
+                if not ret:
+                    time.sleep(0.01)
+                    continue
+                self._publish(frame)
+        finally:
+            with self._cap_lock:
+                self._cap.release()
+                self._released = True
+
+    def _publish(self, frame: np.ndarray) -> None:
+        with self._cond:
+            self._latest = frame
+            self._latest_time = time.monotonic()
+            self._seq += 1
+            self._cond.notify_all()
+
+    def latest(self, timeout: float = 5.0, max_age: float = 2.0) -> Optional[np.ndarray]:
+        """
+        Return the newest frame, waiting up to timeout seconds for one.
+
+        Returns None if no frame younger than max_age seconds arrives, e.g.
+        when the camera was unplugged or stalled and reads keep failing.
+        """
+        def fresh() -> bool:
+            return self._latest is not None and time.monotonic() - self._latest_time <= max_age
+
+        with self._cond:
+            if not self._cond.wait_for(fresh, timeout):
+                return None
+            return self._latest
+
+    def next(self, last_seq: int, timeout: float = 5.0) -> Tuple[int, Optional[np.ndarray]]:
+        """Wait for a frame newer than last_seq and return it with its sequence number"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq, timeout)
+            return self._seq, self._latest
+
+    def get(self, prop: int) -> float:
+        """Read a capture property, serialised with the reader thread"""
+        with self._cap_lock:
+            if self._released:
+                raise ValueError("Camera connection is closed")
+            return self._cap.get(prop)
+
+    def set(self, prop: int, value: float) -> bool:
+        """Set a capture property, serialised with the reader thread"""
+        with self._cap_lock:
+            if self._released:
+                raise ValueError("Camera connection is closed")
+            return self._cap.set(prop, value)
+
+    def stop(self, timeout: float = 2.0) -> bool:
+        """
+        Stop the reader thread, which then releases the camera.
+
+        Returns:
+            True if the thread has exited (and the camera is released); if a
+            read is stuck in the driver, the release happens when it returns
+        """
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        return not self._thread.is_alive()
+
+def _get_grabber(connection_id: str) -> FrameGrabber:
+    with _captures_lock:
+        grabber = _grabbers.get(connection_id)
+    if grabber is None:
+        raise ValueError(f"No active connection with ID: {connection_id}")
+    return grabber
 
 # Define our application context
 @dataclass
@@ -44,9 +198,13 @@ async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
     finally:
         # Cleanup on shutdown
         #print("Shutting down VideoCapture MCP Server")
-        for connection_id, cap in active_captures.items():
-            cap.release()
-        active_captures.clear()
+        with _captures_lock:
+            connection_ids = list(active_captures)
+        for connection_id in connection_ids:
+            try:
+                _close_connection(connection_id)
+            except ValueError:
+                pass  # already closed by a concurrent request
 
 # Initialize the FastMCP server with lifespan
 # mcp = FastMCP("VideoCapture",
@@ -54,27 +212,36 @@ async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
 #               dependencies=["opencv-python", "numpy"],
 #               lifespan=app_lifespan)
 mcp = FastMCP("VideoCapture")
-def main():
-    """Main entry point for the VideoCapture Server"""
 
-    mcp.run(transport="streamable-http", host="10.253.55.134", port=9001)
-    # mcp.run(transport="streamable-http", host="10.253.69.100", port=9001)
+def _check_jpeg_backend() -> None:
+    """Warn if OpenCV was not built against libjpeg-turbo (slow JPEG encode)"""
+    if "libjpeg-turbo" not in cv2.getBuildInformation():
+        print("⚠️ OpenCV is not built with libjpeg-turbo, JPEG encoding will be slower")
 
-@mcp.tool()
-def agent_result(text: str) -> bool:
+_audio_enabled = False
+
+def enable_audio_tools() -> None:
     """
-        Play the result for the user to listen to
+    Register the speech tools (agent_result, record_speech_text).
 
-        Args:
-            text (str): The play of content
-        Returns:
-            bool: is played
+    pyttsx3, sounddevice, scipy and FunASR are only imported here, so a
+    camera-only server doesn't load them.
     """
-    print(f"agent result：{text}")
-    tts_engine = pyttsx3.init()
-    tts_engine.say(text)
-    tts_engine.runAndWait()
-    return True
+    global _audio_enabled
+    if _audio_enabled:
+        return
+    from videocapture_audio import register_audio_tools
+
+    register_audio_tools(mcp)
+    _audio_enabled = True
+
+def main():
+    """Main entry point for the VideoCapture Server"""
+    if "--with-audio" in sys.argv[1:]:
+        enable_audio_tools()
+    _check_jpeg_backend()
+    mcp.run(transport="streamable-http", host="10.253.55.134", port=9001)
+    # mcp.run(transport="streamable-http", host="10.253.69.100", port=9001)
 
 # @mcp.tool()
 def record_speech(duration=5, samplerate=16000) -> str:
@@ -88,105 +255,188 @@ def record_speech(duration=5, samplerate=16000) -> str:
     Returns:
         str: the audio file url
     """
-    return upload_to_wos(_record_speech(duration, samplerate))
+    from videocapture_audio import record_speech_file
+
+    return upload_to_wos(record_speech_file(duration, samplerate))
 
 @mcp.tool()
-def record_speech_text(duration=5, samplerate=16000) -> str:
+async def quick_capture_url(device_index: int = 0, flip: bool = False) -> str:
     """
-    Record for a duration using a microphone and convert it into text
+    Quickly open a camera, capture a single frame, and close it.
+    If the camera is already open, use the existing connection.
 
     Args:
-        duration (int): Recording duration, in seconds
-        samplerate (int): sampling rate
+        device_index: Camera index (0 is usually the default webcam)
+        flip: Whether to horizontally flip the image
 
     Returns:
-        str: the text from record
-    """
-    file = _record_speech(duration, samplerate)
-    # 2️⃣ 识别语音文件
-    res = model.generate(input=file)
-
-    # 3️⃣ 输出文字结果
-    text = res[0]['text']
-    print(text)
-    return text
-
-def _record_speech(duration=5, samplerate=16000) -> str:
-    # 1️⃣ TTS 提示
-    tts_engine = pyttsx3.init()
-    tts_engine.say("请说话")
-    tts_engine.runAndWait()
-
-    # 2️⃣ 录音
-    print(f"开始录音，时长 {duration} 秒...")
-    audio = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1)
-    sd.wait()  # 等待录音结束
-
-    # 3️⃣ 保存到临时文件
-    temp_dir = tempfile.gettempdir()
-    temp_file = os.path.join(temp_dir, "speech_input.wav")
-    write(temp_file, samplerate, audio)  # 保存 WAV
-    print(f"录音已保存到：{temp_file}")
-    return temp_file
+        The Image url address
+    """
+    return await asyncio.to_thread(_quick_capture_url, device_index, flip)
+
+def _quick_capture_url(device_index: int = 0, flip: bool = False) -> str:
+    return _upload_and_remove(_capture_to_file(device_index, flip))
 
 @mcp.tool()
-def quick_capture_url(device_index: int = 0, flip: bool = False) -> str:
+async def quick_capture_url_async(device_index: int = 0, flip: bool = False) -> str:
     """
-    Quickly open a camera, capture a single frame, and close it.
-    If the camera is already open, use the existing connection.
+    Capture a single frame and upload it in the background.
+    The camera is free again as soon as the frame is captured; use
+    get_upload_result with the returned task ID to get the Image url.
 
     Args:
         device_index: Camera index (0 is usually the default webcam)
         flip: Whether to horizontally flip the image
 
+    Returns:
+        The upload task ID
+    """
+    return await asyncio.to_thread(_quick_capture_url_async, device_index, flip)
+
+def _quick_capture_url_async(device_index: int = 0, flip: bool = False) -> str:
+    tmp_path = _capture_to_file(device_index, flip)
+    task_id = uuid.uuid4().hex
+    _prune_upload_tasks()
+    future = _upload_pool.submit(_upload_and_remove, tmp_path)
+    with _upload_lock:
+        _upload_tasks[task_id] = future
+    future.add_done_callback(lambda _, task_id=task_id: _mark_upload_finished(task_id))
+    return task_id
+
+def _mark_upload_finished(task_id: str) -> None:
+    with _upload_lock:
+        if task_id in _upload_tasks:
+            _upload_finished[task_id] = time.monotonic()
+
+def _prune_upload_tasks() -> None:
+    """Forget finished uploads whose result was never collected"""
+    cutoff = time.monotonic() - _UPLOAD_RESULT_TTL
+    with _upload_lock:
+        for task_id, finished in list(_upload_finished.items()):
+            if finished < cutoff:
+                del _upload_finished[task_id]
+                _upload_tasks.pop(task_id, None)
+
+@mcp.tool()
+async def get_upload_result(task_id: str, timeout: float = 30) -> str:
+    """
+    Wait for a background upload started by quick_capture_url_async.
+
+    Args:
+        task_id: ID returned by quick_capture_url_async
+        timeout: Maximum seconds to wait for the upload
+
     Returns:
         The Image url address
     """
+    return await asyncio.to_thread(_get_upload_result, task_id, timeout)
+
+def _get_upload_result(task_id: str, timeout: float = 30) -> str:
+    _prune_upload_tasks()
+    with _upload_lock:
+        future = _upload_tasks.get(task_id)
+    if future is None:
+        raise ValueError(f"No upload task with ID: {task_id}")
+    try:
+        return future.result(timeout=timeout)
+    finally:
+        if future.done():
+            with _upload_lock:
+                _upload_tasks.pop(task_id, None)
+                _upload_finished.pop(task_id, None)
+
+def _capture_to_file(device_index: int = 0, flip: bool = False) -> Path:
     # 1️⃣ 捕获图片
-    image: Image = _quick_capture(device_index=device_index, flip=flip)
+    frame = _quick_capture_frame(device_index=device_index, flip=flip)
 
     # 2️⃣ 创建临时文件
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp_file:
         tmp_path = Path(tmp_file.name)
-        # 3️⃣ 写入 PNG bytes
-        tmp_file.write(image.data)
-
-    # 4️⃣ 上传到 WOS
-    url = upload_to_wos(str(tmp_path))
 
-    # 5️⃣ 删除临时文件
+    # 3️⃣ 直接编码 JPEG 到文件，不经过内存中的 bytes
     try:
-        tmp_path.unlink()
+        if not cv2.imwrite(str(tmp_path), frame, _jpeg_params(85)):
+            raise RuntimeError(f"Failed to write frame to {tmp_path}")
     except Exception:
-        pass
+        # 写入失败时删除空的临时文件
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path
+
+def _upload_and_remove(tmp_path: Path) -> str:
+    try:
+        # 4️⃣ 上传到 WOS
+        return upload_to_wos(str(tmp_path))
+    finally:
+        # 5️⃣ 删除临时文件，上传失败也要删除
+        try:
+            tmp_path.unlink()
+        except Exception:
+            pass
 
-    return url
+def _quick_capture(device_index: int = 0, flip: bool = False, quality: int = 85,
+                   max_dim: Optional[int] = 1024) -> Image:
+    return _encode_frame(_quick_capture_frame(device_index, flip, max_dim), quality)
 
-def _quick_capture(device_index: int = 0, flip: bool = False) -> Image:
-    # Check if this device is already open
-    device_key = None
-    for key, cap in active_captures.items():
-        if key.startswith(f"camera_{device_index}_"):
-            device_key = key
-            break
+def _acquire_device(device_index: int) -> str:
+    """
+    Find an open connection for the device, opening a temporary one if needed.
+    Every call must be paired with _release_device.
 
-    # If device is not already open, open it temporarily
-    temp_connection = False
-    if device_key is None:
+    Returns:
+        The connection ID
+    """
+    with _device_lock(device_index):
+        # Check if this device is already open
+        with _captures_lock:
+            device_keys = _by_device.get(device_index)
+            if device_keys:
+                device_key = device_keys[0]
+                if device_key in _temp_refs:
+                    _temp_refs[device_key] += 1
+                return device_key
+
+        # If device is not already open, open it temporarily
         device_key = _open_camera(device_index)
-        temp_connection = True
+        with _captures_lock:
+            _temp_refs[device_key] = 1
+        return device_key
+
+def _release_device(device_key: str) -> None:
+    """Drop a reference taken by _acquire_device, closing the last temporary one"""
+    lock = _lock_connection_device(device_key)
+    if lock is None:
+        return  # already closed
+    try:
+        with _captures_lock:
+            refs = _temp_refs.get(device_key)
+            if refs is None:
+                return  # opened with open_camera
+            if refs > 1:
+                _temp_refs[device_key] = refs - 1
+                return
+            grabber = _detach_connection(device_key)
+        # Keep the device locked until the grabber thread has released the camera
+        if not grabber.stop():
+            print(f"⚠️ Camera read for {device_key} is stuck, it will be released when the read returns")
+    finally:
+        lock.release()
+
+def _quick_capture_frame(device_index: int = 0, flip: bool = False,
+                         max_dim: Optional[int] = None) -> np.ndarray:
+    device_key = _acquire_device(device_index)
 
     try:
         # Capture the frame
-        frame = _capture_frame(device_key, flip)
+        frame = _read_frame(device_key, flip, max_dim)
         return frame
     finally:
         # Close the connection if we opened it temporarily
-        if temp_connection:
-            _close_connection(device_key)
+        _release_device(device_key)
 
 @mcp.tool()
-def quick_capture(device_index: int = 0, flip: bool = False) -> Image:
+async def quick_capture(device_index: int = 0, flip: bool = False, quality: int = 85,
+                        max_dim: Optional[int] = 1024) -> Image:
     """
     Quickly open a camera, capture a single frame, and close it.
     If the camera is already open, use the existing connection.
@@ -194,95 +444,252 @@ def quick_capture(device_index: int = 0, flip: bool = False) -> Image:
     Args:
         device_index: Camera index (0 is usually the default webcam)
         flip: Whether to horizontally flip the image
+        quality: JPEG quality (0-100)
+        max_dim: Downscale so the longest side is at most this many pixels (None for full size)
     
     Returns:
         The captured frame as an Image object
     """
-    return _quick_capture(device_index, flip)
+    return await asyncio.to_thread(_quick_capture, device_index, flip, quality, max_dim)
+
+def _default_backend() -> int:
+    """Native capture backend for the current platform"""
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "win32":
+        return cv2.CAP_DSHOW
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
 
 @mcp.tool()
-def open_camera(device_index: int = 0, name: Optional[str] = None) -> str:
+async def open_camera(device_index: int = 0, name: Optional[str] = None,
+                      width: Optional[int] = None, height: Optional[int] = None,
+                      fps: Optional[float] = None, fourcc: Optional[str] = "MJPG",
+                      backend: Optional[int] = None) -> str:
     """
         Open a connection to a camera device.
 
         Args:
             device_index: Camera index (0 is usually the default webcam)
             name: Optional name to identify this camera connection
+            width: Optional capture width in pixels
+            height: Optional capture height in pixels
+            fps: Optional capture frame rate
+            fourcc: Pixel format to request from the camera (None keeps the driver default)
+            backend: OpenCV capture backend (cv2.CAP_*), defaults to the platform's native one
 
         Returns:
             Connection ID for the opened camera
         """
-    return _open_camera(device_index, name)
+    return await asyncio.to_thread(_open_camera, device_index, name, width, height, fps, fourcc,
+                                   backend)
 
-def _open_camera(device_index: int = 0, name: Optional[str] = None) -> str:
+def _open_camera(device_index: int = 0, name: Optional[str] = None,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 fps: Optional[float] = None, fourcc: Optional[str] = "MJPG",
+                 backend: Optional[int] = None) -> str:
     """
     Open a connection to a camera device.
     
     Args:
         device_index: Camera index (0 is usually the default webcam)
         name: Optional name to identify this camera connection
+        width: Optional capture width in pixels
+        height: Optional capture height in pixels
+        fps: Optional capture frame rate
+        fourcc: Pixel format to request from the camera (None keeps the driver default)
+        backend: OpenCV capture backend (cv2.CAP_*), defaults to the platform's native one
     
     Returns:
         Connection ID for the opened camera
     """
     if name is None:
         name = f"camera_{device_index}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    cap = cv2.VideoCapture(device_index)
-    if not cap.isOpened():
-        raise ValueError(f"Failed to open camera at index {device_index}")
-    
-    active_captures[name] = cap
-    return name
+    if fourcc and len(fourcc) != 4:
+        raise ValueError(f"fourcc must be 4 characters, got: {fourcc!r}")
+    # Hold the device lock so a concurrent _acquire_device cannot open it twice
+    with _device_lock(device_index):
+        with _captures_lock:
+            if name in active_captures:
+                raise ValueError(f"Connection ID already in use: {name}")
+
+        # Name the backend explicitly so OpenCV doesn't probe every registered one
+        if backend is None:
+            backend = _default_backend()
+        cap = cv2.VideoCapture(device_index, backend)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"Failed to open camera at index {device_index}")
+
+        try:
+            # Negotiate the format before the first read: MJPG keeps USB bandwidth low
+            # compared to the uncompressed YUYV most webcams default to
+            if fourcc:
+                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            if width:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            if height:
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            if fps:
+                cap.set(cv2.CAP_PROP_FPS, fps)
+            # Keep only the newest frame in the driver queue
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # Discard the first frame while auto exposure settles
+            cap.read()
+        except Exception:
+            cap.release()
+            raise
+
+        with _captures_lock:
+            # Re-check: another request may have taken the name while we were opening
+            if name in active_captures:
+                cap.release()
+                raise ValueError(f"Connection ID already in use: {name}")
+            active_captures[name] = cap
+            _grabbers[name] = FrameGrabber(name, cap)
+            _by_device.setdefault(device_index, []).append(name)
+        return name
 
 
 @mcp.tool()
-def capture_frame(connection_id: str, flip: bool = False) -> Image:
+async def capture_frame(connection_id: str, flip: bool = False, quality: int = 85,
+                        max_dim: Optional[int] = 1024) -> Image:
     """
     Capture a single frame from the specified video source.
 
     Args:
         connection_id: ID of the previously opened video connection
         flip: Whether to horizontally flip the image
+        quality: JPEG quality (0-100)
+        max_dim: Downscale so the longest side is at most this many pixels (None for full size)
 
     Returns:
         The captured frame as an Image object
     """
-    return  _capture_frame(connection_id, flip)
+    return await asyncio.to_thread(_capture_frame, connection_id, flip, quality, max_dim)
+
+@mcp.tool()
+async def png_capture_frame(connection_id: str, flip: bool = False) -> Image:
+    """
+    Capture a single lossless PNG frame from the specified video source.
 
-def _capture_frame(connection_id: str, flip: bool = False) -> Image:
+    Args:
+        connection_id: ID of the previously opened video connection
+        flip: Whether to horizontally flip the image
+
+    Returns:
+        The captured frame as a PNG Image object
+    """
+    return await asyncio.to_thread(_capture_frame, connection_id, flip, max_dim=None,
+                                   image_format="png")
+
+def _capture_frame(connection_id: str, flip: bool = False, quality: int = 85,
+                   max_dim: Optional[int] = 1024, image_format: str = "jpeg") -> Image:
     """
     Capture a single frame from the specified video source.
     
     Args:
         connection_id: ID of the previously opened video connection
         flip: Whether to horizontally flip the image
+        quality: JPEG quality (0-100), ignored for PNG
+        max_dim: Downscale so the longest side is at most this many pixels (None for full size)
+        image_format: "jpeg" (default) or "png" for lossless output
     
     Returns:
         The captured frame as an Image object
     """
-    if connection_id not in active_captures:
-        raise ValueError(f"No active connection with ID: {connection_id}")
+    return _encode_frame(_read_frame(connection_id, flip, max_dim), quality, image_format)
+
+def _read_frame(connection_id: str, flip: bool = False,
+                max_dim: Optional[int] = None) -> np.ndarray:
+    """
+    Get the newest frame from the specified video source.
+
+    Args:
+        connection_id: ID of the previously opened video connection
+        flip: Whether to horizontally flip the image
+        max_dim: Downscale so the longest side is at most this many pixels (None for full size)
+
+    Returns:
+        The captured frame as a BGR array
+    """
+    grabber = _get_grabber(connection_id)
     
-    cap = active_captures[connection_id]
-    ret, frame = cap.read()
+    # Take the newest frame from the grabber thread; encoding happens outside its lock
+    frame = grabber.latest()
     
-    if not ret:
+    if frame is None:
         raise RuntimeError(f"Failed to capture frame from {connection_id}")
     
-    if flip:
-        frame = cv2.flip(frame, 1)  # 1 for horizontal flip
-    
-    
-    # Encode the image as PNG
-    _, png_data = cv2.imencode('.png', frame)
+    return _prepare_frame(frame, flip, max_dim)
+
+def _prepare_frame(frame: np.ndarray, flip: bool = False,
+                   max_dim: Optional[int] = None) -> np.ndarray:
+    """Downscale, then flip, a frame shared with the grabber"""
+    resized = _downscale(frame, max_dim)
+    if not flip:
+        return resized
+    if resized is not frame:
+        # The resize produced a private copy, so flip the smaller image in place
+        return cv2.flip(resized, 1, dst=resized)  # 1 for horizontal flip
+    # The grabber's frame is shared by every caller, so flip into a new array
+    return cv2.flip(frame, 1)
+
+def _jpeg_params(quality: int) -> List[int]:
+    return [int(cv2.IMWRITE_JPEG_QUALITY), quality, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+
+def _downscale(frame: np.ndarray, max_dim: Optional[int]) -> np.ndarray:
+    """Shrink a frame so its longest side is at most max_dim pixels"""
+    if max_dim is None:
+        return frame
+    if max_dim <= 0:
+        raise ValueError(f"max_dim must be positive, got {max_dim}")
+    h, w = frame.shape[:2]
+    if max(h, w) <= max_dim:
+        return frame
+    scale = max_dim / max(h, w)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def _encode_frame(frame: np.ndarray, quality: int = 85, image_format: str = "jpeg") -> Image:
+    # Encode the image (JPEG by default, PNG when lossless output is requested)
+    if image_format == "png":
+        _, img_data = cv2.imencode('.png', frame)
+    else:
+        _, img_data = cv2.imencode('.jpg', frame, _jpeg_params(quality))
     
-    # Return as MCP Image object
-    return Image(data=png_data.tobytes(), 
-                 format="png")
+    # Return as MCP Image object. Image only base64-encodes its data, so a flat
+    # view of the encoded buffer is enough and saves copying it into bytes
+    return Image(data=memoryview(img_data).cast("B"), 
+                 format=image_format)
+
+# (name, cv2 property, cast) reported by get_video_properties
+_GET_PROP_MAP = (
+    ("width", cv2.CAP_PROP_FRAME_WIDTH, int),
+    ("height", cv2.CAP_PROP_FRAME_HEIGHT, int),
+    ("fps", cv2.CAP_PROP_FPS, float),
+    ("frame_count", cv2.CAP_PROP_FRAME_COUNT, int),
+    ("brightness", cv2.CAP_PROP_BRIGHTNESS, float),
+    ("contrast", cv2.CAP_PROP_CONTRAST, float),
+    ("saturation", cv2.CAP_PROP_SATURATION, float),
+    ("format", cv2.CAP_PROP_FORMAT, int),
+)
+
+# Property names accepted by set_video_property
+_SET_PROP_MAP = {
+    "width": cv2.CAP_PROP_FRAME_WIDTH,
+    "height": cv2.CAP_PROP_FRAME_HEIGHT,
+    "fps": cv2.CAP_PROP_FPS,
+    "brightness": cv2.CAP_PROP_BRIGHTNESS,
+    "contrast": cv2.CAP_PROP_CONTRAST,
+    "saturation": cv2.CAP_PROP_SATURATION,
+    "auto_exposure": cv2.CAP_PROP_AUTO_EXPOSURE,
+    "auto_focus": cv2.CAP_PROP_AUTOFOCUS
+}
 
 @mcp.tool()
-def get_video_properties(connection_id: str) -> dict:
+async def get_video_properties(connection_id: str) -> dict:
     """
     Get properties of the video source.
     
@@ -292,26 +699,14 @@ def get_video_properties(connection_id: str) -> dict:
     Returns:
         Dictionary of video properties
     """
-    if connection_id not in active_captures:
-        raise ValueError(f"No active connection with ID: {connection_id}")
-    
-    cap = active_captures[connection_id]
-    
-    properties = {
-        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-        "fps": cap.get(cv2.CAP_PROP_FPS),
-        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-        "brightness": cap.get(cv2.CAP_PROP_BRIGHTNESS),
-        "contrast": cap.get(cv2.CAP_PROP_CONTRAST),
-        "saturation": cap.get(cv2.CAP_PROP_SATURATION),
-        "format": int(cap.get(cv2.CAP_PROP_FORMAT))
-    }
-    
-    return properties
+    return await asyncio.to_thread(_get_video_properties, connection_id)
+
+def _get_video_properties(connection_id: str) -> dict:
+    grabber = _get_grabber(connection_id)
+    return {name: cast(grabber.get(prop)) for name, prop, cast in _GET_PROP_MAP}
 
 @mcp.tool()
-def set_video_property(connection_id: str, property_name: str, value: float) -> bool:
+async def set_video_property(connection_id: str, property_name: str, value: float) -> bool:
     """
     Set a property of the video source.
     
@@ -323,29 +718,19 @@ def set_video_property(connection_id: str, property_name: str, value: float) ->
     Returns:
         True if successful, False otherwise
     """
-    if connection_id not in active_captures:
-        raise ValueError(f"No active connection with ID: {connection_id}")
-    
-    cap = active_captures[connection_id]
-    
-    property_map = {
-        "width": cv2.CAP_PROP_FRAME_WIDTH,
-        "height": cv2.CAP_PROP_FRAME_HEIGHT,
-        "fps": cv2.CAP_PROP_FPS,
-        "brightness": cv2.CAP_PROP_BRIGHTNESS,
-        "contrast": cv2.CAP_PROP_CONTRAST,
-        "saturation": cv2.CAP_PROP_SATURATION,
-        "auto_exposure": cv2.CAP_PROP_AUTO_EXPOSURE,
-        "auto_focus": cv2.CAP_PROP_AUTOFOCUS
-    }
+    return await asyncio.to_thread(_set_video_property, connection_id, property_name, value)
+
+def _set_video_property(connection_id: str, property_name: str, value: float) -> bool:
+    grabber = _get_grabber(connection_id)
     
-    if property_name not in property_map:
+    prop = _SET_PROP_MAP.get(property_name)
+    if prop is None:
         raise ValueError(f"Unknown property: {property_name}")
     
-    return cap.set(property_map[property_name], value)
+    return grabber.set(prop, value)
 
 @mcp.tool()
-def close_connection(connection_id: str) -> bool:
+async def close_connection(connection_id: str) -> bool:
     """
         Close a video connection and release resources.
 
@@ -355,7 +740,7 @@ def close_connection(connection_id: str) -> bool:
         Returns:
             True if successful
         """
-    return _close_connection(connection_id)
+    return await asyncio.to_thread(_close_connection, connection_id)
 
 def _close_connection(connection_id: str) -> bool:
     """
@@ -367,13 +752,33 @@ def _close_connection(connection_id: str) -> bool:
     Returns:
         True if successful
     """
-    if connection_id not in active_captures:
+    lock = _lock_connection_device(connection_id)
+    if lock is None:
         raise ValueError(f"No active connection with ID: {connection_id}")
-    
-    active_captures[connection_id].release()
-    del active_captures[connection_id]
+    try:
+        grabber = _detach_connection(connection_id)
+        # The grabber thread releases the camera after its last read; the device
+        # stays locked until then so it can't be reopened while still held
+        if not grabber.stop():
+            print(f"⚠️ Camera read for {connection_id} is stuck, it will be released when the read returns")
+    finally:
+        lock.release()
     return True
 
+def _detach_connection(connection_id: str) -> FrameGrabber:
+    """Remove a connection from every index; the caller stops the returned grabber"""
+    with _captures_lock:
+        if active_captures.pop(connection_id, None) is None:
+            raise ValueError(f"No active connection with ID: {connection_id}")
+        _temp_refs.pop(connection_id, None)
+        for device_index, device_keys in _by_device.items():
+            if connection_id in device_keys:
+                device_keys.remove(connection_id)
+                if not device_keys:
+                    del _by_device[device_index]
+                break
+        return _grabbers.pop(connection_id)
+
 @mcp.tool()
 def list_active_connections() -> list:
     """
@@ -382,7 +787,84 @@ def list_active_connections() -> list:
     Returns:
         List of active connection IDs
     """
-    return list(active_captures.keys())
+    with _captures_lock:
+        return list(active_captures.keys())
+
+# Stream workers block for up to a frame timeout waiting on the grabber; keep
+# them on their own bounded pool so viewers can't starve the tool threads
+_stream_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stream")
+
+class _CameraStreamResponse(StreamingResponse):
+    """StreamingResponse that always releases its camera, even on early disconnect"""
+
+    def __init__(self, content, device_key: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self._device_key = device_key
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await asyncio.to_thread(_release_device, self._device_key)
+
+@mcp.custom_route("/stream/{device_index:int}", methods=["GET"])
+async def stream_camera(request: Request) -> Response:
+    """
+    Serve a camera as an MJPEG (multipart/x-mixed-replace) HTTP stream.
+
+    Query parameters:
+        flip: "1"/"true" to horizontally flip the image
+        quality: JPEG quality (0-100)
+    """
+    device_index = request.path_params["device_index"]
+    flip = request.query_params.get("flip", "").lower() in ("1", "true")
+    try:
+        quality = min(max(int(request.query_params.get("quality", 85)), 0), 100)
+    except ValueError:
+        return PlainTextResponse("quality must be an integer (0-100)", status_code=400)
+
+    # Temporary connections are reference counted, so other viewers or
+    # quick_capture calls can share this one without it closing under them
+    try:
+        device_key = await asyncio.to_thread(_acquire_device, device_index)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=503)
+    try:
+        grabber = _get_grabber(device_key)
+    except ValueError as e:
+        await asyncio.to_thread(_release_device, device_key)
+        return PlainTextResponse(str(e), status_code=503)
+
+    def next_chunk(last_seq: int) -> Tuple[int, Optional[bytes]]:
+        seq, frame = grabber.next(last_seq)
+        if seq == last_seq or frame is None:
+            return seq, None
+        frame = _prepare_frame(frame, flip)
+        _, img_data = cv2.imencode('.jpg', frame, _jpeg_params(quality))
+        return seq, b"".join((b"--frame\r\nContent-Type: image/jpeg\r\n\r\n", img_data, b"\r\n"))
+
+    async def frames():
+        loop = asyncio.get_running_loop()
+        last_seq = 0
+        while not await request.is_disconnected():
+            last_seq, chunk = await loop.run_in_executor(_stream_pool, next_chunk, last_seq)
+            if chunk is None:
+                break
+            yield chunk
+
+    return _CameraStreamResponse(frames(), device_key,
+                                 media_type="multipart/x-mixed-replace; boundary=frame")
+
+# Pooled HTTP session reused across uploads
+_upload_session = requests.Session()
+# Background uploads for quick_capture_url_async, keyed by task ID
+_upload_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")
+_upload_tasks: Dict[str, Future] = {}
+# Completion times of uploads in _upload_tasks, so uncollected results expire
+_upload_finished: Dict[str, float] = {}
+_upload_lock = threading.Lock()
+# Seconds a finished upload's result is kept for get_upload_result
+_UPLOAD_RESULT_TTL = 600
 
 def upload_to_wos(file_path) -> str:
     # logger_debug_msg(f'文件开始上传 文件地址: {file_path} ')
@@ -390,10 +872,13 @@ def upload_to_wos(file_path) -> str:
     serverUrl = "https://ireview.58corp.com/api/aigc/uploadVideo"
     print('upload_to_wos: ', file_path);
     with open(file_path, "rb") as f:
-        files = {
-            "file": f,
-        }
-        uploadRes = requests.post(serverUrl, files=files)
+        # 流式上传：分块从磁盘读取，不在内存中拼接整个 multipart body
+        encoder = MultipartEncoder(fields={
+            "file": (os.path.basename(file_path), f, "application/octet-stream"),
+        })
+        uploadRes = _upload_session.post(serverUrl, data=encoder,
+                                         headers={"Content-Type": encoder.content_type},
+                                         timeout=30)
         print(uploadRes.text)
         resUploadObj = uploadRes.json()
         print('resUploadObj', resUploadObj);
@@ -403,6 +888,10 @@ def upload_to_wos(file_path) -> str:
 
     return resource_url
 
+# Speech tools are opt-in: set VC_MCP_AUDIO=1/true/yes (or pass --with-audio to main)
+if os.getenv("VC_MCP_AUDIO", "").lower() in ("1", "true", "yes"):
+    enable_audio_tools()
+
 # For: $ mcp run videocapture_mcp.py
 def run():
     main()